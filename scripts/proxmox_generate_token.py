@@ -4,6 +4,7 @@ import urllib3
 from getpass import getpass
 from datetime import datetime
 from proxmoxer import ProxmoxAPI
+from proxmoxer.core import ResourceException
 
 # ===== Edit these if needed =====
 PROXMOX_HOST    = "192.168.1.30"  # Hostname or IP of a Proxmox node or cluster VIP
@@ -26,11 +27,27 @@ def prompt_password_twice(label: str, min_len: int = 12) -> str:
             continue
         return p1
 
-def unique_token_id(preferred: str, existing_ids: set) -> str:
-    """Return preferred if free; otherwise append a timestamp suffix."""
-    if preferred not in existing_ids:
-        return preferred
-    return f"{preferred}-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+def create_token(proxmox, user_id: str, preferred: str):
+    """Create token `preferred`; if it is already taken, retry with a timestamp suffix."""
+    tokens = proxmox.access.users(user_id).token
+    # privsep=0 => token inherits user's privileges (full in this case)
+    try:
+        return preferred, tokens(preferred).post(comment="Ansible automation token", privsep=0)
+    except ResourceException as e:
+        if "already exists" not in str(e).lower():
+            raise
+    token_id = f"{preferred}-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    return token_id, tokens(token_id).post(comment="Ansible automation token", privsep=0)
+
+def user_exists(proxmox, user_id: str) -> bool:
+    """Return True if `user_id` exists."""
+    try:
+        proxmox.access.users(user_id).get()
+    except ResourceException as e:
+        if "no such user" in str(e).lower():
+            return False
+        raise
+    return True
 
 def main():
     # --- Prompt for credentials (not echoed) ---
@@ -53,8 +70,7 @@ def main():
 
     # --- Ensure user exists ---
     try:
-        users = proxmox.access.users.get()
-        if any(u.get("userid") == user_id for u in users):
+        if user_exists(proxmox, user_id):
             print(f"ℹ️ User '{user_id}' already exists. Skipping creation.")
         else:
             print(f"✅ Creating user '{user_id}'")
@@ -63,32 +79,18 @@ def main():
         print(f"❌ Error ensuring user exists: {e}")
         sys.exit(1)
 
-    # --- Ensure Administrator role on '/' ---
+    # --- Ensure Administrator role on '/' (PUT is idempotent; no need to read the ACL table) ---
     try:
-        acls = proxmox.access.acl.get()
-        has_admin = any(
-            a.get("userid") == user_id and a.get("roleid") == ROLE and a.get("path") == "/"
-            for a in acls
-        )
-        if has_admin:
-            print(f"ℹ️ '{user_id}' already has '{ROLE}' on '/'.")
-        else:
-            print(f"✅ Granting '{ROLE}' to '{user_id}' on '/'")
-            proxmox.access.acl.put(path="/", users=user_id, roles=ROLE)
+        print(f"✅ Granting '{ROLE}' to '{user_id}' on '/'")
+        proxmox.access.acl.put(path="/", users=user_id, roles=ROLE)
     except Exception as e:
         print(f"❌ Error assigning role: {e}")
         sys.exit(1)
 
     # --- Create API token (no privilege separation; inherits user's perms) ---
     try:
-        # Collect existing token IDs to avoid conflicts
-        existing_tokens = proxmox.access.users(user_id).token.get()  # list of dicts
-        existing_ids = {t.get("tokenid") for t in existing_tokens} if isinstance(existing_tokens, list) else set()
-        token_id = unique_token_id(TOKEN_BASENAME, existing_ids)
-
-        print(f"✅ Creating API token '{token_id}' for '{user_id}'")
-        # privsep=0 => token inherits user's privileges (full in this case)
-        resp = proxmox.access.users(user_id).token(token_id).post(comment="Ansible automation token", privsep=0)
+        token_id, resp = create_token(proxmox, user_id, TOKEN_BASENAME)
+        print(f"✅ Created API token '{token_id}' for '{user_id}'")
 
         # API returns the secret only once at creation time
         token_secret = resp.get("value")